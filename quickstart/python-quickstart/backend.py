@@ -1,9 +1,10 @@
 import os
 import logging
+import logging.handlers
 import threading
 import queue
 import asyncio
-import traceback
+from concurrent.futures import ThreadPoolExecutor
 from flask import Flask, request, jsonify
 from pycloudflared import try_cloudflare
 from dotenv import load_dotenv
@@ -13,7 +14,17 @@ load_dotenv()
 
 app = Flask(__name__)
 
-logging.basicConfig(level=logging.INFO)
+# Log records go through a queue and are written by a background listener
+# thread, so request handlers and WebSocket listeners never block on console
+# I/O.
+log_queue = queue.Queue(-1)
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(message)s",
+    handlers=[logging.handlers.QueueHandler(log_queue)],
+)
+log_listener = logging.handlers.QueueListener(log_queue, logging.StreamHandler())
+log_listener.start()
 logger = logging.getLogger(__name__)
 
 # --- Configuration ---
@@ -32,13 +43,13 @@ public_url = None
 
 def setup():
     global conn, public_url
-    print("Connecting to VideoDB...")
+    logger.info("Connecting to VideoDB...")
     conn = videodb.connect(api_key=VIDEO_DB_API_KEY)
 
-    print(f"Starting Cloudflare Tunnel on port {PORT}...")
+    logger.info(f"Starting Cloudflare Tunnel on port {PORT}...")
     tunnel = try_cloudflare(port=PORT)
     public_url = tunnel.tunnel
-    print(f"Cloudflare Tunnel Started: {public_url}")
+    logger.info(f"Cloudflare Tunnel Started: {public_url}")
 
 
 @app.route("/health", methods=["GET"])
@@ -51,7 +62,7 @@ def init_session():
     """Creates a capture session and returns a client token."""
     try:
         webhook_url = f"{public_url}/webhook"
-        print(f"Creating session with webhook: {webhook_url}")
+        logger.info(f"Creating session with webhook: {webhook_url}")
 
         session = conn.create_capture_session(
             end_user_id="quickstart-user",
@@ -80,11 +91,11 @@ def start_ws_listener(ws_id_queue, name="Listener"):
     def run():
         async def listen():
             try:
-                print(f"[{name}] Connecting to WebSocket...")
+                logger.info(f"[{name}] Connecting to WebSocket...")
                 ws_wrapper = conn.connect_websocket()
                 ws = await ws_wrapper.connect()
                 ws_id = ws.connection_id
-                print(f"[{name}] Connected! ID: {ws_id}")
+                logger.info(f"[{name}] Connected! ID: {ws_id}")
 
                 ws_id_queue.put(ws_id)
 
@@ -95,23 +106,22 @@ def start_ws_listener(ws_id_queue, name="Listener"):
                     if channel == "transcript":
                         text = data.get("text", "")
                         if text.strip():
-                            print(f"[{name}] {text}")
+                            logger.info(f"[{name}] {text}")
                     elif channel == "audio_index":
                         text = data.get("text", "")
                         if text.strip():
-                            print(f"\n{'*' * 50}")
-                            print(f"[{name}] Audio Index: {text}")
-                            print(f"{'*' * 50}")
+                            logger.info(
+                                f"\n{'*' * 50}\n[{name}] Audio Index: {text}\n{'*' * 50}"
+                            )
                     elif channel in ["scene_index", "visual_index"]:
                         text = data.get("text", "")
                         if text.strip():
-                            print(f"\n{'*' * 50}")
-                            print(f"[{name}] Visual Index: {text}")
-                            print(f"{'*' * 50}")
+                            logger.info(
+                                f"\n{'*' * 50}\n[{name}] Visual Index: {text}\n{'*' * 50}"
+                            )
 
             except Exception as e:
-                print(f"[{name}] Error: {e}")
-                traceback.print_exc()
+                logger.exception(f"[{name}] Error: {e}")
 
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
@@ -122,20 +132,119 @@ def start_ws_listener(ws_id_queue, name="Listener"):
     return t
 
 
-# --- Webhook Handler & AI Pipelines ---
+# --- AI Pipelines ---
+# Each stream gets its own WebSocket and pipeline. Starting a pipeline waits
+# for its socket to connect, so the streams are started concurrently to keep
+# total startup time at the slowest stream rather than the sum of all three.
+
+def start_audio_pipeline(rtstream, name):
+    """Starts transcription + audio indexing on a single RTStream."""
+    logger.info(f"  Indexing {name}: {rtstream.id}")
+
+    q = queue.Queue()
+    start_ws_listener(q, name=name)
+    ws_id = q.get(timeout=10)
+
+    rtstream.start_transcript(ws_connection_id=ws_id)
+    rtstream.index_audio(
+        prompt="Summarize what is being discussed",
+        ws_connection_id=ws_id,
+        batch_config={"type": "time", "value": 30},
+    )
+    logger.info(f"  {name} indexing started (socket: {ws_id})")
+
+
+def start_visual_pipeline(rtstream, name):
+    """Starts visual indexing on a single RTStream."""
+    logger.info(f"  Indexing {name}: {rtstream.id}")
+
+    q = queue.Queue()
+    start_ws_listener(q, name=name)
+    ws_id = q.get(timeout=10)
+
+    rtstream.index_visuals(
+        prompt="In one sentence, describe what is on screen",
+        ws_connection_id=ws_id,
+    )
+    logger.info(f"  {name} indexing started (socket: {ws_id})")
+
+
+def process_active_session(capture_session_id):
+    """Fetches an active session's RTStreams and starts their AI pipelines."""
+    try:
+        session = conn.get_capture_session(capture_session_id)
+        logger.info(f"Retrieved Session: {session.id}")
+
+        mics = session.get_rtstream("mic")
+        displays = session.get_rtstream("screen")
+        system_audios = session.get_rtstream("system_audio")
+
+        logger.info(
+            f"  Mics: {len(mics)} | System Audio: {len(system_audios)} | Displays: {len(displays)}"
+        )
+
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            futures = []
+            if system_audios:
+                futures.append(
+                    pool.submit(
+                        start_audio_pipeline, system_audios[0], "SystemAudioWatcher"
+                    )
+                )
+            if mics:
+                futures.append(
+                    pool.submit(start_audio_pipeline, mics[0], "MicWatcher")
+                )
+            if displays:
+                futures.append(
+                    pool.submit(start_visual_pipeline, displays[0], "VisualWatcher")
+                )
+            for future in futures:
+                future.result()
+
+    except Exception as e:
+        logger.exception(f"Error starting AI pipelines: {e}")
+
+
+# --- Webhook Handler ---
+# Webhook deliveries can be retried, and a replayed capture_session.active
+# would start a second set of AI pipelines on the same session. Handled
+# (event, session) pairs are remembered in-process; the set is bounded so a
+# long-running backend doesn't grow it forever.
+
+seen_events = set()
+seen_events_lock = threading.Lock()
+SEEN_EVENTS_MAX = 1024
+
+
+def is_duplicate_event(event, capture_session_id):
+    """Returns True if this (event, session) pair was already handled."""
+    key = (event, capture_session_id)
+    with seen_events_lock:
+        if key in seen_events:
+            return True
+        if len(seen_events) >= SEEN_EVENTS_MAX:
+            seen_events.clear()
+        seen_events.add(key)
+        return False
+
 
 @app.route("/webhook", methods=["POST"])
 def webhook():
     """Receives webhook events from VideoDB and starts AI pipelines."""
-    data = request.json
+    # Parse the body exactly once; everything below reads from this dict.
+    data = request.get_json(silent=True)
+    if data is None:
+        logger.info("\n[WEBHOOK] Received non-JSON payload")
+        return jsonify({"error": "expected a JSON body"}), 400
+
     event = data.get("event")
 
     if event is None:
-        print("\n[WEBHOOK] Received event with no type")
-        print(f"  Payload: {data}")
+        logger.info(f"\n[WEBHOOK] Received event with no type\n  Payload: {data}")
         return jsonify({"received": True})
 
-    print(f"\n[WEBHOOK] Event: {event}")
+    logger.info(f"\n[WEBHOOK] Event: {event}")
 
     if event not in [
         "capture_session.active",
@@ -145,80 +254,28 @@ def webhook():
     ]:
         return jsonify({"received": True})
 
-    if event == "capture_session.active":
-        print("Capture Session Active! Starting AI pipelines...")
-        capture_session_id = data.get("capture_session_id")
-
-        try:
-            session = conn.get_capture_session(capture_session_id)
-            print(f"Retrieved Session: {session.id}")
-
-            mics = session.get_rtstream("mic")
-            displays = session.get_rtstream("screen")
-            system_audios = session.get_rtstream("system_audio")
+    capture_session_id = data.get("capture_session_id")
+    if capture_session_id and is_duplicate_event(event, capture_session_id):
+        logger.info(f"  Duplicate delivery of {event}; already handled")
+        return jsonify({"received": True, "duplicate": True})
 
-            print(
-                f"  Mics: {len(mics)} | System Audio: {len(system_audios)} | Displays: {len(displays)}"
-            )
-
-            # Start AI on System Audio
-            if system_audios:
-                sys_audio = system_audios[0]
-                print(f"  Indexing system audio: {sys_audio.id}")
-
-                q = queue.Queue()
-                start_ws_listener(q, name="SystemAudioWatcher")
-                ws_id = q.get(timeout=10)
-
-                sys_audio.start_transcript(ws_connection_id=ws_id)
-                sys_audio.index_audio(
-                    prompt="Summarize what is being discussed",
-                    ws_connection_id=ws_id,
-                    batch_config={"type": "time", "value": 30},
-                )
-                print(f"  System Audio indexing started (socket: {ws_id})")
-
-            # Start AI on Mic
-            if mics:
-                mic = mics[0]
-                print(f"  Indexing mic: {mic.id}")
-
-                q = queue.Queue()
-                start_ws_listener(q, name="MicWatcher")
-                ws_id = q.get(timeout=10)
-
-                mic.start_transcript(ws_connection_id=ws_id)
-                mic.index_audio(
-                    prompt="Summarize what is being discussed",
-                    ws_connection_id=ws_id,
-                    batch_config={"type": "time", "value": 30},
-                )
-                print(f"  Mic indexing started (socket: {ws_id})")
-
-            # Start AI on Displays
-            if displays:
-                display = displays[0]
-                print(f"  Indexing display: {display.id}")
-
-                q = queue.Queue()
-                start_ws_listener(q, name="VisualWatcher")
-                ws_id = q.get(timeout=10)
-
-                display.index_visuals(
-                    prompt="In one sentence, describe what is on screen",
-                    ws_connection_id=ws_id,
-                )
-                print(f"  Visual indexing started (socket: {ws_id})")
-
-        except Exception as e:
-            print(f"Error in webhook processing: {e}")
-            traceback.print_exc()
+    if event == "capture_session.active":
+        logger.info("Capture Session Active! Starting AI pipelines...")
+        # Pipeline startup waits on WebSocket connections (up to 10s per
+        # stream), so run it on a daemon thread and acknowledge the webhook
+        # immediately to avoid delivery timeouts and retries.
+        threading.Thread(
+            target=process_active_session,
+            args=(capture_session_id,),
+            daemon=True,
+        ).start()
+        return jsonify({"received": True}), 202
 
     elif event == "capture_session.stopping":
-        print("Session stopping...")
+        logger.info("Session stopping...")
 
     elif event == "capture_session.stopped":
-        print("Session stopped. All streams finalized.")
+        logger.info("Session stopped. All streams finalized.")
 
     elif event == "capture_session.exported":
         export_data = data.get("data", {})
@@ -226,18 +283,20 @@ def webhook():
         stream_url = export_data.get("stream_url")
         player_url = export_data.get("player_url")
 
-        print(f"\nRecording Exported! Video ID: {video_id}")
+        logger.info(f"\nRecording Exported! Video ID: {video_id}")
         if stream_url:
-            print(f"  Stream URL: {stream_url}")
+            logger.info(f"  Stream URL: {stream_url}")
         if player_url:
-            print(f"  Player URL: {player_url}")
-
-        print(f"\n{'=' * 60}")
-        print("What's next?")
-        print("  - Try different index_audio() prompts for richer insights")
-        print("  - Build alerts with rtstream.create_alert()")
-        print("  - Explore the full SDK: https://docs.videodb.io")
-        print(f"{'=' * 60}")
+            logger.info(f"  Player URL: {player_url}")
+
+        logger.info(
+            f"\n{'=' * 60}\n"
+            "What's next?\n"
+            "  - Try different index_audio() prompts for richer insights\n"
+            "  - Build alerts with rtstream.create_alert()\n"
+            "  - Explore the full SDK: https://docs.videodb.io\n"
+            f"{'=' * 60}"
+        )
 
     return jsonify({"received": True})
 